@@ -0,0 +1 @@
+"""Shared helpers for the CPL (Career Portal Links) scrapers."""
@@ -0,0 +1,5 @@
+import sys
+
+from cpl.cli import main
+
+sys.exit(main())
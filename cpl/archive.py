@@ -0,0 +1,319 @@
+"""
+Poll history per portal, stored as deltas in compressed segments.
+
+Layout of archive/<portal>/:
+- head.json          fingerprints of the latest poll {key: [digest, {field: hash}]}
+                     (cpl/fingerprint.py) + bookkeeping, used to diff the next poll
+- current.jsonl      open segment: a keyframe line {"t", "full"} then one
+                     {"t", "add", "upd", "unset", "del"} line per poll that changed
+                     something; "upd" holds only the changed fields of existing
+                     postings, "unset" {key: [field, ...]} the fields they lost
+- seg-<t0>.jsonl.gz  sealed segments (same format, gzipped)
+- index.json         [[t0, t1, file], ...] of sealed segments, sorted by t0
+- spans.json         {key: [[first_seen, gone_at|null], ...]}
+
+Polls that change nothing only touch head.json, so months of 5-minute
+polling cost one line per actual change. `at(T)` bisects the index and
+replays a single segment (each segment starts with a keyframe); `spans(key)`
+is a dict lookup; `changes(since)` lists field edits with old/new values.
+Times are unix seconds.
+
+Only complete sweeps are archived: a posting missing from a poll is
+recorded as gone, so a run that stopped at page one (or at --limit) would look
+like mass closures. Page iterators call Poll.mark_complete() once they reach
+the end of the results; Poll.finish() commits only then.
+
+One poll per portal at a time: a Poll holds archive/<portal>/.lock (flock)
+from creation until commit, so an overlapping cron run (e.g. behind a
+throttled --all sweep) is not archived instead of diffing a stale head.json.
+"""
+
+import bisect
+import fcntl
+import gzip
+import json
+import os
+import time
+import typing as t
+from pathlib import Path
+
+from cpl import fingerprint
+
+ROOT = Path(__file__).resolve().parent.parent
+ARCHIVE_DIR = Path(os.getenv("CPL_ARCHIVE_DIR", ROOT / "archive"))
+
+SEGMENT_RECORDS = 500            # delta lines before a segment is sealed
+SEGMENT_SECONDS = 7 * 24 * 3600  # ...or once it spans a week
+
+CURRENT = "current.jsonl"
+
+
+def _read_json(path: Path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write_json(path: Path, obj) -> None:
+    # write-then-rename so a crash never leaves a half-written state file
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _line(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _apply(state: t.Dict[str, dict], rec: dict) -> t.Dict[str, dict]:
+    if "full" in rec:
+        return dict(rec["full"])
+    for k in rec["del"]:
+        state.pop(k, None)
+    for k, fields in rec.get("upd", {}).items():
+        state[k] = {**state.get(k, {}), **fields}
+    for k, fields in rec.get("unset", {}).items():
+        state[k] = {f: v for f, v in state.get(k, {}).items() if f not in fields}
+    state.update(rec["add"])
+    return state
+
+
+class Archive:
+    def __init__(self, portal: str, root: t.Optional[Path] = None):
+        self.portal = portal
+        self.dir = Path(root or ARCHIVE_DIR) / portal
+
+    # ---- writing ----
+
+    def lock(self) -> t.Optional[t.IO]:
+        """
+        Take archive/<portal>/.lock without waiting. Returns the open lock file
+        (closing it releases the lock), or None if another poll holds it.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        f = open(self.dir / ".lock", "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    def head(self) -> dict:
+        return _read_json(self.dir / "head.json", {"t": None, "seg_t0": None, "seg_records": 0, "fp": {}})
+
+    def commit(self, head: dict, added: t.Dict[str, dict], updated: t.Dict[str, dict],
+               unset: t.Dict[str, t.List[str]], fps: t.Dict[str, list], seen: t.Set[str],
+               when: t.Optional[float] = None) -> dict:
+        """
+        Record one poll. `added` holds new records, `updated` the changed
+        fields of existing ones, `unset` the fields they no longer have,
+        `fps` the new fingerprints, `seen` every key present in the poll.
+        Returns a summary (see describe()).
+        """
+        when = int(time.time() if when is None else when)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        fp = head["fp"]
+        removed = [k for k in fp if k not in seen]
+        for k in removed:
+            del fp[k]
+        fp.update(fps)
+
+        delta = {"t": when, "add": added, "upd": updated, "unset": unset, "del": removed}
+        changed = {k: sorted([*updated.get(k, {}), *unset.get(k, [])]) for k in {*updated, *unset}}
+        if head["seg_t0"] is None:
+            self._start_segment(head, when, added)
+        elif added or changed or removed:
+            # the delta always lands in a segment (changes() reads it from there);
+            # a rollover then starts the next segment from the post-delta state
+            with open(self.dir / CURRENT, "a", encoding="utf-8") as f:
+                f.write(_line(delta))
+            head["seg_records"] += 1
+            if (head["seg_records"] >= SEGMENT_RECORDS
+                    or when - head["seg_t0"] >= SEGMENT_SECONDS):
+                head["t"] = when
+                state = self._replay(CURRENT, when)
+                self._seal(head)
+                self._start_segment(head, when, state)
+        head["t"] = when
+        _write_json(self.dir / "head.json", head)
+
+        if added or removed:
+            spans = self._spans()
+            for k in added:
+                spans.setdefault(k, []).append([when, None])
+            for k in removed:
+                if spans.get(k) and spans[k][-1][1] is None:
+                    spans[k][-1][1] = when
+            _write_json(self.dir / "spans.json", spans)
+
+        return {"added": len(added), "changed": len(changed), "removed": len(removed),
+                "t": when, "changes": changed}
+
+    def _start_segment(self, head: dict, when: int, state: t.Dict[str, dict]) -> None:
+        with open(self.dir / CURRENT, "w", encoding="utf-8") as f:
+            f.write(_line({"t": when, "full": state}))
+        head["seg_t0"] = when
+        head["seg_records"] = 0
+
+    def _seal(self, head: dict) -> None:
+        name = f"seg-{head['seg_t0']}.jsonl.gz"
+        with open(self.dir / CURRENT, "rb") as src, gzip.open(self.dir / name, "wb") as dst:
+            dst.write(src.read())
+        index = self._index()
+        index.append([head["seg_t0"], head["t"], name])
+        _write_json(self.dir / "index.json", index)
+
+    # ---- reading ----
+
+    def _index(self) -> list:
+        return _read_json(self.dir / "index.json", [])
+
+    def _spans(self) -> dict:
+        return _read_json(self.dir / "spans.json", {})
+
+    def _segments(self) -> t.List[t.Tuple[int, t.Optional[int], str]]:
+        segs = [tuple(entry) for entry in self._index()]
+        seg_t0 = self.head()["seg_t0"]
+        if seg_t0 is not None:
+            segs.append((seg_t0, None, CURRENT))
+        return segs
+
+    def _records(self, name: str) -> t.Iterator[dict]:
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(self.dir / name, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def _replay(self, name: str, when: float) -> t.Dict[str, dict]:
+        state: t.Dict[str, dict] = {}
+        for rec in self._records(name):
+            if rec["t"] > when:
+                break
+            state = _apply(state, rec)
+        return state
+
+    def at(self, when: float) -> t.Dict[str, dict]:
+        """Postings that were open as of `when` (as last polled at or before it)."""
+        segs = self._segments()
+        i = bisect.bisect_right([t0 for t0, _, _ in segs], when) - 1
+        if i < 0:
+            return {}
+        return self._replay(segs[i][2], when)
+
+    def changes(self, since: float = 0) -> t.Iterator[t.Tuple[int, str, t.Dict[str, list]]]:
+        """
+        (t, key, {field: [old, new]}) for every edit to an existing posting at
+        or after `since`; a removed field is reported as [old] (no new value).
+        """
+        for _t0, t1, name in self._segments():
+            if t1 is not None and t1 < since:
+                continue
+            state: t.Dict[str, dict] = {}
+            for rec in self._records(name):
+                if rec["t"] >= since:
+                    upd, unset = rec.get("upd", {}), rec.get("unset", {})
+                    for k in sorted({*upd, *unset}):
+                        old = state.get(k, {})
+                        diff = {f: [old.get(f), v] for f, v in upd.get(k, {}).items()}
+                        diff.update({f: [old.get(f)] for f in unset.get(k, [])})
+                        yield rec["t"], k, diff
+                state = _apply(state, rec)
+
+    def spans(self, key: str) -> t.List[list]:
+        """[[first_seen, gone_at or None], ...] for one posting key."""
+        return self._spans().get(key, [])
+
+    def live_seconds(self, key: str, now: t.Optional[float] = None) -> int:
+        now = int(time.time() if now is None else now)
+        return sum((end if end is not None else now) - start for start, end in self.spans(key))
+
+
+class Poll:
+    """
+    Collects one poll from a stream of records.
+    Each record is fingerprinted and checked against head.json: new postings
+    are kept whole until commit(), modified ones only as their changed fields,
+    unchanged ones not at all (so a first poll, or a mass repost, holds the
+    whole sweep in memory). `record`
+    projects an item onto what is archived (e.g. to leave out volatile fields);
+    tee() still yields the original items.
+
+        poll = Poll("kla", key=posting_key, record=archive_record)
+        pages = iter_search_pages(cfg, pages, on_exhausted=poll.mark_complete)
+        n = write_postings_to_file(poll.tee(...), OUTPUT_PATH)
+        print(poll.finish())
+    """
+
+    def __init__(self, portal: str, key: t.Callable[[dict], str],
+                 record: t.Optional[t.Callable[[dict], dict]] = None, root: t.Optional[Path] = None):
+        self.archive = Archive(portal, root)
+        self.key = key
+        self.record = record
+        self._lock = self.archive.lock()  # held until commit(); see the module docstring
+        self._head = self.archive.head()
+        self.added: t.Dict[str, dict] = {}
+        self.updated: t.Dict[str, dict] = {}
+        self.unset: t.Dict[str, t.List[str]] = {}
+        self.fps: t.Dict[str, list] = {}
+        self.seen: t.Set[str] = set()
+        self.complete = False
+
+    def mark_complete(self) -> None:
+        """The sweep reached the last page, so missing postings really are gone."""
+        self.complete = True
+
+    def tee(self, items: t.Iterable[dict]) -> t.Iterator[dict]:
+        known = self._head["fp"]
+        for item in items:
+            it = self.record(item) if self.record else item
+            k = self.key(it)
+            self.seen.add(k)
+            digest, hashes = fingerprint.of(it)
+            prev = known.get(k)
+            if prev is None:
+                self.added[k] = it
+                self.fps[k] = [digest, hashes]
+            elif prev[0] != digest:
+                fields = fingerprint.changed_fields(prev[1], hashes)
+                changed = {f: it[f] for f in fields if f in it}
+                gone = [f for f in fields if f not in it]
+                if changed:
+                    self.updated[k] = changed
+                if gone:
+                    self.unset[k] = gone
+                self.fps[k] = [digest, hashes]
+            yield item
+
+    def commit(self, when: t.Optional[float] = None) -> dict:
+        if self._lock is None:
+            raise RuntimeError(f"another {self.archive.portal} poll holds {self.archive.dir / '.lock'}")
+        try:
+            return self.archive.commit(self._head, self.added, self.updated, self.unset,
+                                       self.fps, self.seen, when)
+        finally:
+            self._lock.close()
+            self._lock = None
+
+    def finish(self) -> str:
+        """Commit if the sweep was complete; returns the console line either way."""
+        if self._lock is None:
+            return f"Not archived: another {self.archive.portal} poll was already running."
+        if not self.complete:
+            self._lock.close()
+            self._lock = None
+            return "Not archived: stopped before the last page (use --all for a full sweep)."
+        return describe(self.commit())
+
+
+def describe(summary: dict, show: int = 5) -> str:
+    """Console summary of a commit(), listing the first few modified postings."""
+    lines = [f"Archived: {summary['added']} new, {summary['changed']} changed, {summary['removed']} gone."]
+    for k, fields in list(summary["changes"].items())[:show]:
+        lines.append(f"  ~ {k}: {', '.join(fields)}")
+    if summary["changed"] > show:
+        lines.append(f"  ... and {summary['changed'] - show} more")
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+"""
+`python -m cpl <portal> [--limit N]` — one entry point for every scraper.
+
+Portal scripts are loaded only when their subcommand runs, and they import
+`requests`/`dotenv` lazily themselves, so `python -m cpl --help` (or a cron
+job that exits early) never pays for the HTTP stack.
+`--timing` prints how long startup took to stderr.
+
+`python -m cpl archive at|span|changes ...` queries the poll history (cpl/archive.py).
+"""
+
+import time
+
+_T0 = time.perf_counter()
+
+import argparse
+import importlib.util
+import json
+import re
+import sys
+import typing as t
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# subcommand -> script (relative to the repo root)
+PORTALS = {
+    "kla": "kla/kla-auto.py",
+    "cvs-health": "cvs-health/cvs-health-auto.py",
+    "cvs-test": "cvs-test/cvs-test.py",
+}
+
+_LEGACY_LIMIT = re.compile(r"^--(\d+)$")
+
+
+def load_portal(name: str):
+    """Import a portal script by subcommand name (cached in sys.modules)."""
+    mod_name = f"cpl_portal_{name.replace('-', '_')}"
+    if mod_name in sys.modules:
+        return sys.modules[mod_name]
+    path = ROOT / PORTALS[name]
+    # Invoked as `python kla/kla-auto.py`: reuse the running script, don't import it twice.
+    running = sys.modules.get("__main__")
+    if getattr(running, "__file__", None) and Path(running.__file__).resolve() == path:
+        return running
+    spec = importlib.util.spec_from_file_location(mod_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[mod_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _translate_legacy(argv: t.List[str]) -> t.List[str]:
+    # The scripts used to accept a bare `--N`; keep that working as `--limit N`.
+    out = []
+    for a in argv:
+        m = _LEGACY_LIMIT.match(a)
+        out.extend(["--limit", m.group(1)] if m else [a])
+    return out
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="cpl", description="Career portal scrapers.")
+    ap.add_argument("--timing", action="store_true", help="print startup time to stderr")
+    sub = ap.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    for name, script in PORTALS.items():
+        p = sub.add_parser(name, help=f"run {script}")
+        p.add_argument("-n", "--limit", type=int, default=None,
+                       help="only keep the first N postings (legacy form: --N)")
+        p.add_argument("-p", "--pages", type=int, default=None,
+                       help="number of result pages to fetch (portal default if omitted)")
+        p.add_argument("--all", action="store_true",
+                       help="fetch every page; only complete sweeps go into the archive")
+
+    arch = sub.add_parser("archive", help="query the poll history").add_subparsers(
+        dest="query", required=True, metavar="QUERY")
+    at = arch.add_parser("at", help="postings open at a point in time (JSON)")
+    at.add_argument("portal", choices=list(PORTALS))
+    at.add_argument("when", help="ISO date/time (local) or unix seconds")
+    span = arch.add_parser("span", help="when a posting was live")
+    span.add_argument("portal", choices=list(PORTALS))
+    span.add_argument("key", help="posting key, e.g. the job link / externalPath")
+    changes = arch.add_parser("changes", help="field edits to existing postings")
+    changes.add_argument("portal", choices=list(PORTALS))
+    changes.add_argument("--since", default="0", help="ISO date/time (local) or unix seconds")
+    return ap
+
+
+def parse_when(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        from datetime import datetime
+
+        return datetime.fromisoformat(value).timestamp()
+
+
+def run_archive_query(args) -> int:
+    from cpl import archive
+
+    arc = archive.Archive(args.portal)
+    if args.query == "at":
+        jobs = arc.at(parse_when(args.when))
+        print(json.dumps(list(jobs.values()), ensure_ascii=False, indent=2))
+        return 0
+    if args.query == "changes":
+        for when, key, fields in arc.changes(parse_when(args.since)):
+            print(f"{_fmt_time(when)}  {key}")
+            for f, vals in fields.items():
+                new = json.dumps(vals[1], ensure_ascii=False) if len(vals) > 1 else "(removed)"
+                print(f"    {f}: {json.dumps(vals[0], ensure_ascii=False)} -> {new}")
+        return 0
+    spans = arc.spans(args.key)
+    if not spans:
+        print(f"No history for {args.key!r} in {args.portal}.", file=sys.stderr)
+        return 1
+    for start, end in spans:
+        print(f"{_fmt_time(start)} -> {_fmt_time(end) if end else 'still open'}")
+    hours = arc.live_seconds(args.key) / 3600
+    print(f"Live for {hours:.1f} h in total.")
+    return 0
+
+
+def _fmt_time(ts: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+
+
+def report_startup(label: str) -> None:
+    wall = (time.perf_counter() - _T0) * 1000
+    cpu = time.process_time() * 1000
+    print(f"cpl: {label} ready in {wall:.1f} ms ({cpu:.1f} ms CPU since process start)",
+          file=sys.stderr)
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    args = build_parser().parse_args(_translate_legacy(sys.argv[1:] if argv is None else argv))
+    if args.command == "archive":
+        if args.timing:
+            report_startup("archive")
+        return run_archive_query(args)
+    module = load_portal(args.command)
+    if args.timing:
+        report_startup(args.command)
+    module.main(limit_n=args.limit, pages=0 if args.all else args.pages)
+    return 0
@@ -0,0 +1,41 @@
+"""
+Content fingerprints for postings.
+
+Each record gets one short hash per field plus a digest over those hashes.
+Stored next to the job key, they let a poll spot modified postings with one
+string comparison per record, and name the changed fields by comparing the
+per-field hashes, without keeping or diffing the full previous record.
+"""
+
+import hashlib
+import json
+import typing as t
+
+DIGEST_SIZE = 8  # bytes; 16 hex chars per hash
+
+
+def _h(data: str) -> str:
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def field_hashes(record: dict, ignore: t.Iterable[str] = ()) -> t.Dict[str, str]:
+    skip = set(ignore)
+    return {
+        f: _h(json.dumps(v, sort_keys=True, ensure_ascii=False))
+        for f, v in record.items() if f not in skip
+    }
+
+
+def digest(hashes: t.Dict[str, str]) -> str:
+    return _h("\0".join(f"{f}={hashes[f]}" for f in sorted(hashes)))
+
+
+def of(record: dict, ignore: t.Iterable[str] = ()) -> t.Tuple[str, t.Dict[str, str]]:
+    """(digest, per-field hashes) for a record."""
+    hashes = field_hashes(record, ignore)
+    return digest(hashes), hashes
+
+
+def changed_fields(old: t.Dict[str, str], new: t.Dict[str, str]) -> t.List[str]:
+    """Fields added, removed or edited between two per-field hash maps."""
+    return sorted(f for f in old.keys() | new.keys() if old.get(f) != new.get(f))
@@ -0,0 +1,23 @@
+"""Stable keys for normalized postings (the job_* schema of cvs-test.json)."""
+
+import re
+
+
+def norm(s: str) -> str:
+    if s is None:
+        return ""
+    s = str(s)
+    s = s.strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def job_key(job: dict) -> str:
+    # Prefer job_link if present; else fall back to normalized title+location+date
+    link = (job.get("job_link") or "").strip()
+    if link:
+        return f"link::{link}"
+    title = norm(job.get("job_title"))
+    loc   = norm(job.get("job_location"))
+    date  = norm(job.get("job_posted_date"))
+    return f"tld::{title}|{loc}|{date}"
@@ -0,0 +1,289 @@
+"""
+Phenom career-site adapter: page through the `/widgets` JSON API, falling
+back to scraping `search-results?from=N` HTML only if the API is rejected.
+
+A search-results HTML page is ~1.2 MB to carry ~25 jobs in its embedded
+`eagerLoadRefineSearch` JSON; the widgets call returns just that JSON.
+On top of that:
+- pages ask for `size` jobs (default 50) instead of the site's 10; a server
+  that serves fewer per call is paged by what it actually returns,
+- only the first call asks for facet counts (`counts`, `all_fields`);
+  later pages turn them off, so they are jobs only,
+- pages after the first are fetched `concurrency` at a time (the per-host
+  limiter in cpl.throttle still paces them) and yielded in order.
+"""
+
+import base64
+import html
+import json
+import typing as t
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+# "Most recent" search on jobs.cvshealth.com (ddoKey eagerLoadRefineSearch), used by
+# cvs-health-auto.py and cvs-test.py; paging overrides from/size (see payload_for).
+RECENT_PAYLOAD = {"sortBy":"Most recent","subsearch":"","from":0,"jobs":True,"counts":True,"all_fields":["category","subCategory","country","state","city","type","remote","businessUnit","phLocSlider"],"pageName":"search-results","size":10,"clearAll":False,"jdsource":"facets","isSliderEnable":True,"pageId":"page10","siteType":"external","keywords":"","global":True,"selected_fields":{},"sort":{"order":"desc","field":"postedDate"},"locationData":{"sliderRadius":50,"aboveMaxRadius":True,"LocationUnit":"miles"},"s":"1","lang":"en_us","deviceType":"desktop","country":"us","refNum":"CVSCHLUS","ddoKey":"eagerLoadRefineSearch"}
+
+DEFAULT_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+
+
+class WidgetsRejected(RuntimeError):
+    """The widgets API refused the first call (bad status / not JSON / no jobs without totalHits=0)."""
+
+
+class PageError(RuntimeError):
+    """A widgets page after the first one failed."""
+
+
+# ---- Parsing helpers ----
+
+def _find_first_list(obj) -> t.List[dict]:
+    """Recursively find the first list of dicts (jobs) in an arbitrary JSON."""
+    if isinstance(obj, list) and (not obj or isinstance(obj[0], dict)):
+        return obj
+    if isinstance(obj, dict):
+        # prefer well-known keys
+        for k in ("jobs", "items", "results", "data"):
+            if k in obj:
+                found = _find_first_list(obj[k])
+                if found:
+                    return found
+        # otherwise scan all values
+        for v in obj.values():
+            found = _find_first_list(v)
+            if found:
+                return found
+    return []
+
+
+def extract_jobs(resp_json: dict) -> t.List[dict]:
+    """Try to extract the job list from Phenom widgets response."""
+    # Common shapes: {"data":{"jobs":[...]}} or {"refineSearch":{"data":{"jobs":[...]}}}
+    for path in (
+        ("data", "jobs"),
+        ("refineSearch", "data", "jobs"),
+        ("eagerLoadRefineSearch", "data", "jobs"),
+        ("widgets", 0, "data", "jobs"),  # sometimes nested per-widget
+    ):
+        cur = resp_json
+        ok = True
+        for key in path:
+            if isinstance(key, int):
+                if isinstance(cur, list) and len(cur) > key:
+                    cur = cur[key]
+                else:
+                    ok = False
+                    break
+            else:
+                if isinstance(cur, dict) and key in cur:
+                    cur = cur[key]
+                else:
+                    ok = False
+                    break
+        if ok and isinstance(cur, list):
+            return cur
+    # Fallback: search anywhere
+    return _find_first_list(resp_json)
+
+
+def total_hits(resp_json: dict) -> t.Optional[int]:
+    """`totalHits` from the response (top level or one level down), if present."""
+    for obj in (resp_json, *(v for v in resp_json.values() if isinstance(v, dict))):
+        if isinstance(obj.get("totalHits"), int):
+            return obj["totalHits"]
+    return None
+
+
+def extract_json_block(doc: str, key: str) -> str:
+    """
+    Extract the JSON object immediately following `"key":` in the document.
+    Returns the raw JSON text with balanced braces.
+    """
+    anchor = f'"{key}"'
+    i = doc.find(anchor)
+    if i == -1:
+        raise ValueError(f'Anchor "{anchor}" not found')
+    i = doc.find(":", i)
+    if i == -1:
+        raise ValueError(f'Colon after "{anchor}" not found')
+    i = doc.find("{", i)
+    if i == -1:
+        raise ValueError(f'Opening brace after "{anchor}" not found')
+
+    depth = 0
+    in_str = False
+    str_quote = None
+    esc = False
+    start = i
+    for j in range(i, len(doc)):
+        ch = doc[j]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == str_quote:
+                in_str = False
+        else:
+            if ch in ("'", '"'):
+                in_str = True
+                str_quote = ch
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return doc[start:j+1]
+    raise ValueError(f'Unbalanced braces while extracting "{key}"')
+
+
+def eager_load_from_html(page_html: str) -> dict:
+    """The `eagerLoadRefineSearch` JSON embedded in a search-results page."""
+    return json.loads(extract_json_block(html.unescape(page_html), "eagerLoadRefineSearch"))
+
+
+def csrf_from_play_session(cookie: str) -> str:
+    """
+    Phenom keeps the CSRF token inside the PLAY_SESSION cookie (a JWT whose
+    payload is {"data": {"csrfToken": ...}}). Returns "" if it isn't there.
+    """
+    for part in cookie.split(";"):
+        name, _, value = part.strip().partition("=")
+        if name != "PLAY_SESSION":
+            continue
+        try:
+            body = value.split(".")[1]
+            body += "=" * (-len(body) % 4)
+            return json.loads(base64.urlsafe_b64decode(body))["data"].get("csrfToken", "")
+        except (IndexError, ValueError, KeyError, TypeError):
+            return ""
+    return ""
+
+
+# ---- Paging ----
+
+def payload_for(template: dict, offset: int, size: int, first: bool) -> dict:
+    payload = dict(template, size=size, **{"from": offset})
+    if not first:
+        # facets only matter once; drop them so later pages are jobs only
+        payload["counts"] = False
+        payload["all_fields"] = []
+    return payload
+
+
+def _json_or_reject(resp) -> dict:
+    if resp.status_code != 200:
+        raise WidgetsRejected(f"HTTP {resp.status_code}\n{resp.text[:1200]}")
+    try:
+        return resp.json()
+    except ValueError:
+        raise WidgetsRejected(f"widgets response is not JSON\n{resp.text[:1200]}")
+
+
+def iter_widget_pages(post: t.Callable[[dict], t.Any], template: dict, max_jobs: t.Optional[int],
+                      size: int = DEFAULT_SIZE,
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      on_exhausted: t.Optional[t.Callable[[], None]] = None) -> t.Iterator[dict]:
+    """
+    Yield widgets responses covering up to `max_jobs` jobs (None: all), in `from` order.
+    `post(payload)` sends one call and returns the response.
+    `on_exhausted()` is called if the sweep reached the end of the results.
+    Raises WidgetsRejected if the first call fails; later failures raise
+    PageError (falling back mid-way would duplicate postings).
+    """
+    done = on_exhausted or (lambda: None)
+    first = _json_or_reject(post(payload_for(template, 0, size, first=True)))
+    if not isinstance(first, dict) or ("data" not in first and not extract_jobs(first)):
+        raise WidgetsRejected("widgets response has no job list")
+    # the server may serve fewer than `size` jobs a call (jobs.cvshealth.com caps
+    # it at 25), so later offsets step by what the first page actually held
+    step = len(extract_jobs(first))
+    total = total_hits(first)
+    if not step and total != 0:
+        # only an explicit totalHits=0 means "no openings"; anything else (a payload
+        # the API half-understood) would archive every open posting as gone
+        raise WidgetsRejected(f"first widgets page has no jobs (totalHits={total})")
+    yield first
+
+    if not step or (total is not None and step >= total):
+        done()
+        return
+    reaches_end = total is not None and (max_jobs is None or total <= max_jobs)
+    limit = max_jobs if total is None else total if max_jobs is None else min(max_jobs, total)
+    offsets = iter(count(step, step) if limit is None else range(step, limit, step))
+
+    def fetch(offset: int) -> dict:
+        resp = post(payload_for(template, offset, size, first=False))
+        if resp.status_code != 200:
+            raise PageError(f"HTTP {resp.status_code} for from={offset}\n{resp.text[:1200]}")
+        try:
+            return resp.json()
+        except ValueError:
+            raise PageError(f"from={offset} response is not JSON\n{resp.text[:1200]}")
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="phenom") as ex:
+        pending: deque = deque((off, ex.submit(fetch, off)) for _, off in zip(range(concurrency), offsets))
+        short = None  # offset of a page that came back with fewer than `step` jobs
+        try:
+            while pending:
+                offset, fut = pending.popleft()
+                data = fut.result()
+                n = len(extract_jobs(data))
+                if not n:
+                    # without totalHits an empty page is the only end marker; with it,
+                    # postings closed mid-sweep and the tail may have shifted past us
+                    if total is None:
+                        done()
+                    return
+                if short is not None:
+                    raise PageError(f"from={short} returned a short page but from={offset} has jobs; "
+                                    "the page size changed mid-sweep")
+                yield data
+                if n < step:
+                    short = offset
+                nxt = next(offsets, None)
+                if nxt is not None:
+                    pending.append((nxt, ex.submit(fetch, nxt)))
+        finally:
+            for _, f in pending:
+                f.cancel()
+    if reaches_end:
+        done()
+
+
+def iter_html_pages(get_html: t.Callable[[int], str], max_jobs: t.Optional[int],
+                    on_exhausted: t.Optional[t.Callable[[], None]] = None) -> t.Iterator[dict]:
+    """
+    Fallback: yield the `eagerLoadRefineSearch` JSON of successive
+    search-results pages (`get_html(from_offset)` returns the page text)
+    until `max_jobs` jobs (None: all) were seen or a page comes back empty,
+    in which case `on_exhausted()` is called.
+    """
+    offset = 0
+    while max_jobs is None or offset < max_jobs:
+        data = eager_load_from_html(get_html(offset))
+        n = len(extract_jobs(data))
+        yield data
+        if not n:
+            if on_exhausted:
+                on_exhausted()
+            return
+        offset += n
+
+
+def with_fallback(primary: t.Iterator[dict], fallback: t.Callable[[], t.Iterator[dict]],
+                  on_fallback: t.Optional[t.Callable[[WidgetsRejected], None]] = None) -> t.Iterator[dict]:
+    """Iterate `primary`; if its first page raises WidgetsRejected, switch to `fallback()`."""
+    try:
+        first = next(primary)
+    except StopIteration:
+        return
+    except WidgetsRejected as e:
+        if on_fallback:
+            on_fallback(e)
+        yield from fallback()
+        return
+    yield first
+    yield from primary
@@ -0,0 +1,208 @@
+"""
+Streaming fetch -> extract -> normalize -> filter -> dedup -> sink pipeline.
+
+Postings flow through one page at a time:
+- `prefetch()` fetches the next page(s) on a background thread into a bounded
+  queue, so the network overlaps with writing but at most `depth` pages are
+  ever held in memory;
+- every other stage is a plain generator;
+- sinks write each item as soon as it arrives (to `<path>.tmp`, renamed over
+  `<path>` only once the run finishes cleanly), so the first results are on
+  disk before the last page is fetched, and a failed run never replaces the
+  previous good output.
+Stopping early (--limit reached, or the result closed) stops the background
+fetch: past the last page used, at most the `depth` queued pages plus the
+one being fetched (and any Phenom page calls already in flight) are fetched.
+Only the dedup keys seen so far are kept, never the postings themselves.
+"""
+
+import json
+import os
+import queue
+import threading
+import typing as t
+from itertools import islice
+
+T = t.TypeVar("T")
+
+_DONE = object()
+
+
+def prefetch(pages: t.Iterable[T], depth: int = 2) -> t.Iterator[T]:
+    """Iterate `pages` on a worker thread, buffering at most `depth` ahead."""
+    q: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        it = iter(pages)
+        try:
+            for page in it:
+                if not put((page, None)):
+                    break
+        except BaseException as e:  # re-raised in the consumer (incl. SystemExit)
+            put((_DONE, e))
+            return
+        finally:
+            close = getattr(it, "close", None)
+            if close:
+                close()
+        put((_DONE, None))
+
+    th = threading.Thread(target=worker, name="cpl-prefetch", daemon=True)
+    th.start()
+    try:
+        while True:
+            page, err = q.get()
+            if page is _DONE:
+                if err is not None:
+                    raise err
+                return
+            yield page
+    finally:
+        stop.set()
+
+
+def dedup(items: t.Iterable[T], key: t.Callable[[T], t.Hashable]) -> t.Iterator[T]:
+    seen = set()
+    for it in items:
+        k = key(it)
+        if k in seen:
+            continue
+        seen.add(k)
+        yield it
+
+
+def _closing(items: t.Iterator[T], source: t.Iterator) -> t.Iterator[T]:
+    """Yield from `items`, closing `source` as soon as they end or are closed."""
+    try:
+        yield from items
+    finally:
+        source.close()
+
+
+def stream(pages: t.Iterable, *,
+           extract: t.Callable[[t.Any], t.Iterable[dict]],
+           normalize: t.Optional[t.Callable[[dict], t.Any]] = None,
+           keep: t.Optional[t.Callable[[t.Any], bool]] = None,
+           key: t.Optional[t.Callable[[t.Any], t.Hashable]] = None,
+           limit: t.Optional[int] = None,
+           depth: int = 2) -> t.Iterator:
+    """
+    Chain the stages lazily; nothing is fetched until the result is iterated.
+    The prefetch worker stops once `limit` items were taken or the result is
+    closed (drain() closes it), not only when it is garbage collected.
+    """
+    fetched = prefetch(pages, depth)
+    items: t.Iterator = (item for page in fetched for item in extract(page))
+    if normalize is not None:
+        items = map(normalize, items)
+    if keep is not None:
+        items = filter(keep, items)
+    if key is not None:
+        items = dedup(items, key)
+    if limit is not None:
+        items = islice(items, limit)
+    return _closing(items, fetched)
+
+
+def drain(items: t.Iterable, sink: "Sink") -> int:
+    """Write every item to `sink`; returns how many were written. Closes `items` when done."""
+    n = 0
+    try:
+        with sink:
+            for it in items:
+                sink.write(it)
+                n += 1
+    finally:
+        close = getattr(items, "close", None)
+        if close:
+            close()
+    return n
+
+
+# ---- Sinks ----
+
+class Sink:
+    """
+    Incremental writer. Items go to `<path>.tmp`, which replaces `path` on a
+    clean close; if the run fails, the temp file is dropped and the previous
+    output is left untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._f = None
+
+    def _open(self):
+        if self._f is None:
+            self._f = open(self.tmp_path, "w", encoding="utf-8")
+            self.begin()
+
+    def write(self, item) -> None:
+        self._open()
+        self.write_item(item)
+        self.count += 1
+        self._f.flush()
+
+    def close(self, failed: bool = False) -> None:
+        if failed:
+            if self._f is not None:
+                self._f.close()
+                os.remove(self.tmp_path)
+            return
+        self._open()
+        self.end()
+        self._f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(failed=exc_type is not None)
+
+    # hooks
+    def begin(self) -> None:
+        pass
+
+    def write_item(self, item) -> None:
+        raise NotImplementedError
+
+    def end(self) -> None:
+        pass
+
+
+class TextSink(Sink):
+    """`format_fn(item)` blocks separated by `separator` lines (the *.txt outputs)."""
+
+    def __init__(self, path, format_fn: t.Callable[[t.Any], str], separator: str):
+        super().__init__(path)
+        self.format_fn = format_fn
+        self.separator = separator
+
+    def write_item(self, item) -> None:
+        if self.count:
+            self._f.write(self.separator + "\n")
+        self._f.write(self.format_fn(item) + "\n")
+
+
+class JsonArraySink(Sink):
+    """Streams a JSON array; same bytes as json.dump(items, f, ensure_ascii=False, indent=2)."""
+
+    def write_item(self, item) -> None:
+        body = json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self._f.write(("[\n  " if not self.count else ",\n  ") + body)
+
+    def end(self) -> None:
+        self._f.write("\n]" if self.count else "[]")
@@ -0,0 +1,248 @@
+"""
+Per-host rate limiting and circuit breaking shared by every scraper.
+
+All HTTP calls go through `request()`, which
+- waits on a token bucket for the target host (one bucket per host, shared
+  by every caller in the process, thread-safe),
+- adapts that bucket's rate AIMD-style: +1 req/s after a fast response,
+  halved on 429/503 or a slow response, and paused for `Retry-After`,
+- trips a circuit breaker after repeated timeouts / 5xx so a dead portal is
+  skipped for a cool-down instead of holding a worker slot.
+
+Nothing here is portal specific; tweak HostPolicy if a host needs it.
+`requests` is imported on the first call, not at import time.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import typing as t
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+if t.TYPE_CHECKING:
+    import requests
+
+
+@dataclass
+class HostPolicy:
+    start_rate: float = 2.0        # requests / second to begin with
+    min_rate: float = 0.2
+    max_rate: float = 10.0
+    burst: float = 4.0             # bucket capacity
+    increase: float = 1.0          # additive step after a fast response
+    decrease: float = 0.5          # multiplicative factor on 429 / slow response
+    slow_after: float = 5.0        # seconds; slower responses count as back-pressure
+    fail_threshold: int = 3        # consecutive failures before the breaker opens
+    cooldown: float = 60.0         # seconds the breaker stays open
+    max_retries: int = 2           # retries on timeouts and 429/503 (honouring Retry-After)
+    max_retry_after: float = 120.0
+
+
+DEFAULT_POLICY = HostPolicy()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request to a host whose breaker is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"circuit open for {host}; retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to the responses it sees (AIMD)."""
+
+    def __init__(self, policy: HostPolicy = DEFAULT_POLICY):
+        self.policy = policy
+        self.rate = policy.start_rate
+        self.tokens = policy.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.policy.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            if latency > self.policy.slow_after:
+                self.rate = max(self.policy.min_rate, self.rate * self.policy.decrease)
+            else:
+                self.rate = min(self.policy.max_rate, self.rate + self.policy.increase)
+
+    def on_throttled(self, retry_after: t.Optional[float]) -> None:
+        with self._lock:
+            self.rate = max(self.policy.min_rate, self.rate * self.policy.decrease)
+            self.tokens = 0
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+class CircuitBreaker:
+    """closed -> (fail_threshold failures) -> open -> (cooldown) -> half-open -> closed/open."""
+
+    def __init__(self, host: str, policy: HostPolicy = DEFAULT_POLICY):
+        self.host = host
+        self.policy = policy
+        self.failures = 0
+        self.opened_at: t.Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.policy.cooldown - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(self.host, max(remaining, 0))
+            self._probing = True  # half-open: let exactly one request through
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.policy.fail_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a half-open probe that proved nothing either way (next request probes again)."""
+        with self._lock:
+            self._probing = False
+
+
+_policies: t.Dict[str, HostPolicy] = {}
+_buckets: t.Dict[str, TokenBucket] = {}
+_breakers: t.Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def set_policy(host: str, policy: HostPolicy) -> None:
+    """Override the policy for a host (call before its first request)."""
+    with _registry_lock:
+        _policies[host] = policy
+        _buckets.pop(host, None)
+        _breakers.pop(host, None)
+
+
+def bucket_for(host: str) -> TokenBucket:
+    with _registry_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(_policies.get(host, DEFAULT_POLICY))
+        return _buckets[host]
+
+
+def breaker_for(host: str) -> CircuitBreaker:
+    with _registry_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host, _policies.get(host, DEFAULT_POLICY))
+        return _breakers[host]
+
+
+def parse_retry_after(value: t.Optional[str]) -> t.Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def request(method: str, url: str, session: t.Optional[requests.Session] = None,
+            timeout: float = 30, **kwargs) -> requests.Response:
+    """
+    Drop-in for `requests.request` / `session.request` that respects the
+    host's rate limit and circuit breaker. Timeouts, connection errors and
+    429/503 are retried up to `max_retries` times.
+    Raises CircuitOpenError when the host is being skipped, including when
+    the retries themselves tripped the breaker.
+    """
+    import requests
+
+    host = urlsplit(url).netloc
+    bucket = bucket_for(host)
+    breaker = breaker_for(host)
+    policy = bucket.policy
+    send = session.request if session is not None else requests.request
+
+    for attempt in range(policy.max_retries + 1):
+        breaker.before_request()
+        try:
+            bucket.acquire()
+            started = time.monotonic()
+            try:
+                resp = send(method, url, timeout=timeout, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                breaker.record_failure()
+                bucket.on_throttled(None)
+                if attempt < policy.max_retries:
+                    continue
+                if breaker.opened_at is not None:
+                    # report it like any other skipped host rather than as a bare timeout
+                    raise CircuitOpenError(host, policy.cooldown) from e
+                raise
+            latency = time.monotonic() - started
+
+            if resp.status_code in (429, 503):
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                # never park the host for longer than we'd be willing to wait
+                bucket.on_throttled(min(retry_after, policy.max_retry_after) if retry_after else None)
+                if resp.status_code == 503:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()  # 429: the host is up, just busy
+                if attempt < policy.max_retries and (retry_after or 0) <= policy.max_retry_after:
+                    continue
+                return resp
+            if resp.status_code >= 500:
+                breaker.record_failure()
+                bucket.on_throttled(None)  # a failing host never earns a faster rate
+            else:
+                breaker.record_success()
+                bucket.on_success(latency)
+            return resp
+        finally:
+            # any other exception (ChunkedEncodingError, TooManyRedirects, ...) must
+            # not leave a half-open probe outstanding forever
+            breaker.release()
+    return resp
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
@@ -1,19 +1,27 @@
+from __future__ import annotations
+
 import os
 import sys
 import json
 import typing as t
-import requests
 from dataclasses import dataclass
-from dotenv import load_dotenv
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared cpl package
+from cpl import archive, phenom, pipeline, throttle
+
+if t.TYPE_CHECKING:  # requests/dotenv are imported lazily to keep startup fast
+    import requests
 
 
 # ===== Config =====
 BASE_PATH = "/widgets"
-OUTPUT_PATH = "cvs-health-auto.txt"
+OUTPUT_PATH = str(Path(__file__).with_name("cvs-health-auto.txt"))
 SEPARATOR = "#" * 91  # visual break between postings
 
-# "Most recent" payload you shared (ddoKey eagerLoadRefineSearch)
-RECENT_PAYLOAD = {"sortBy":"Most recent","subsearch":"","from":0,"jobs":True,"counts":True,"all_fields":["category","subCategory","country","state","city","type","remote","businessUnit","phLocSlider"],"pageName":"search-results","size":10,"clearAll":False,"jdsource":"facets","isSliderEnable":True,"pageId":"page10","siteType":"external","keywords":"","global":True,"selected_fields":{},"sort":{"order":"desc","field":"postedDate"},"locationData":{"sliderRadius":50,"aboveMaxRadius":True,"LocationUnit":"miles"},"s":"1","lang":"en_us","deviceType":"desktop","country":"us","refNum":"CVSCHLUS","ddoKey":"eagerLoadRefineSearch"}
+# Search payload: phenom.RECENT_PAYLOAD
+PAGE_SIZE = 50     # postings per /widgets call (the site itself asks for 10)
+DEFAULT_PAGES = 1  # pages of PAGE_SIZE postings fetched per run (0 = all)
 
 DEFAULT_UA = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -30,6 +38,8 @@ class CVSConfig:
     referer_path: str = "/us/en/search-results?s=1"  # matches the page making the call
 
 def load_config() -> CVSConfig:
+    from dotenv import load_dotenv
+
     load_dotenv()
     base = os.getenv("CVS_BASE_URL", "https://jobs.cvshealth.com").rstrip("/")
     cookie = os.getenv("CVS_COOKIE", "").strip()
@@ -58,55 +68,34 @@ def build_headers(cfg: CVSConfig) -> dict:
 def post_widgets(cfg: CVSConfig, payload: dict) -> requests.Response:
     url = f"{cfg.base_url}{BASE_PATH}"
     headers = build_headers(cfg)
-    return requests.post(url, headers=headers, json=payload, timeout=30)
-
-# ---- Parsing helpers ----
-
-def _find_first_list(obj) -> t.List[dict]:
-    """Recursively find the first list of dicts (jobs) in an arbitrary JSON."""
-    if isinstance(obj, list) and (not obj or isinstance(obj[0], dict)):
-        return obj
-    if isinstance(obj, dict):
-        # prefer well-known keys
-        for k in ("jobs", "items", "results", "data"):
-            if k in obj:
-                found = _find_first_list(obj[k])
-                if found:
-                    return found
-        # otherwise scan all values
-        for v in obj.values():
-            found = _find_first_list(v)
-            if found:
-                return found
-    return []
-
-def extract_jobs(resp_json: dict) -> t.List[dict]:
-    """Try to extract the job list from Phenom widgets response."""
-    # Common shapes: {"data":{"jobs":[...]}} or {"refineSearch":{"data":{"jobs":[...]}}}
-    for path in (
-        ("data", "jobs"),
-        ("refineSearch", "data", "jobs"),
-        ("widgets", 0, "data", "jobs"),  # sometimes nested per-widget
-    ):
-        cur = resp_json
-        ok = True
-        for key in path:
-            if isinstance(key, int):
-                if isinstance(cur, list) and len(cur) > key:
-                    cur = cur[key]
-                else:
-                    ok = False
-                    break
-            else:
-                if isinstance(cur, dict) and key in cur:
-                    cur = cur[key]
-                else:
-                    ok = False
-                    break
-        if ok and isinstance(cur, list):
-            return cur
-    # Fallback: search anywhere
-    return _find_first_list(resp_json)
+    return throttle.post(url, headers=headers, json=payload, timeout=30)
+
+def get_search_html(cfg: CVSConfig, offset: int) -> str:
+    """Plain search-results page (fallback when /widgets is rejected)."""
+    headers = {
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "User-Agent": cfg.user_agent,
+        "Cookie": cfg.cookie,
+        "Cache-Control": "no-cache",
+        "Pragma": "no-cache",
+    }
+    resp = throttle.get(f"{cfg.base_url}{cfg.referer_path}&from={offset}", headers=headers, timeout=30)
+    resp.raise_for_status()
+    return resp.text
+
+def iter_pages(cfg: CVSConfig, pages: int,
+               on_exhausted: t.Optional[t.Callable[[], None]] = None) -> t.Iterator[dict]:
+    """
+    Yield result pages covering `pages` * PAGE_SIZE postings (0: all): /widgets
+    paging (see cpl/phenom.py), or the HTML search pages if the API is rejected.
+    """
+    max_jobs = pages * PAGE_SIZE or None
+    return phenom.with_fallback(
+        phenom.iter_widget_pages(lambda payload: post_widgets(cfg, payload),
+                                 phenom.RECENT_PAYLOAD, max_jobs, size=PAGE_SIZE, on_exhausted=on_exhausted),
+        lambda: phenom.iter_html_pages(lambda off: get_search_html(cfg, off), max_jobs, on_exhausted),
+        on_fallback=lambda e: print(f"/widgets rejected, falling back to HTML: {e}", file=sys.stderr),
+    )
 
 # ---- Output formatting ----
 
@@ -128,14 +117,10 @@ def build_abs_url(base: str, maybe_path: str) -> str:
         return f"{base}{maybe_path}"
     return maybe_path
 
-def format_posting_lines(p: dict, base_url: str) -> str:
+def normalize_posting(p: dict, base_url: str) -> dict:
     """
-    Write four lines:
-      "title": "..."\n
-      "externalPath": "..."\n
-      "locationsText": "..."\n
-      "postedOn": "..."
-    We map CVS fields defensively to these.
+    Map a raw CVS posting to the four output fields
+    (title, externalPath, locationsText, postedOn), defensively.
     """
     # Title-like
     title = coalesce(
@@ -176,50 +161,73 @@ def format_posting_lines(p: dict, base_url: str) -> str:
         p.get("postedDateStr"),
     )
 
+    return {
+        "title": title,
+        "externalPath": path,
+        "locationsText": location,
+        "postedOn": posted,
+    }
+
+def format_normalized(n: dict) -> str:
+    """
+    Write four lines:
+      "title": "..."\n
+      "externalPath": "..."\n
+      "locationsText": "..."\n
+      "postedOn": "..."
+    """
     return (
-        f'"title": {q(title)}\n'
-        f'"externalPath": {q(path)}\n'
-        f'"locationsText": {q(location)}\n'
-        f'"postedOn": {q(posted)}'
+        f'"title": {q(n["title"])}\n'
+        f'"externalPath": {q(n["externalPath"])}\n'
+        f'"locationsText": {q(n["locationsText"])}\n'
+        f'"postedOn": {q(n["postedOn"])}'
     )
 
-def write_postings_to_file(postings: t.List[dict], base_url: str, out_path: str) -> None:
-    with open(out_path, "w", encoding="utf-8") as f:
-        for i, p in enumerate(postings):
-            f.write(format_posting_lines(p, base_url) + "\n")
-            if i != len(postings) - 1:
-                f.write(SEPARATOR + "\n")
+def format_posting_lines(p: dict, base_url: str) -> str:
+    return format_normalized(normalize_posting(p, base_url))
+
+def posting_key(n: dict) -> str:
+    return n["externalPath"] or format_normalized(n)
+
+def write_postings_to_file(postings: t.Iterable[dict], out_path: str) -> int:
+    """Stream normalized postings (see normalize_posting) to out_path."""
+    return pipeline.drain(postings, pipeline.TextSink(out_path, format_normalized, SEPARATOR))
 
 # ---- Main ----
 
-def main():
+def main(limit_n: t.Optional[int] = None, pages: t.Optional[int] = None):
     cfg = load_config()
 
-    # Modes:
-    #   1) no args        -> write ALL recent results returned by this call
-    #   2) --N            -> write first N from recent results
-    args = sys.argv[1:]
-    limit_n = None
-    if len(args) == 1 and args[0].startswith("--") and args[0][2:].isdigit():
-        limit_n = int(args[0][2:])
-
-    payload = dict(RECENT_PAYLOAD)
-    resp = post_widgets(cfg, payload)
-    if resp.status_code != 200:
-        print(f"HTTP {resp.status_code}\n{resp.text[:1200]}")
+    # Modes (argument parsing lives in cpl/cli.py):
+    #   1) limit_n=None   -> write ALL recent results from `pages` pages
+    #   2) limit_n=N      -> write first N from recent results (stops fetching at N)
+    # Raw postings are normalized as they arrive, so only one page of raw dicts is held.
+    # Only complete sweeps go into the history archive (see cpl/archive.py)
+    poll = archive.Poll("cvs-health", key=posting_key) if limit_n is None else None
+    postings = pipeline.stream(
+        iter_pages(cfg, DEFAULT_PAGES if pages is None else pages,
+                   on_exhausted=poll.mark_complete if poll else None),
+        extract=phenom.extract_jobs,
+        normalize=lambda p: normalize_posting(p, cfg.base_url),
+        key=posting_key,
+        limit=limit_n,
+    )
+    try:
+        n = write_postings_to_file(poll.tee(postings) if poll else postings, OUTPUT_PATH)
+    except throttle.CircuitOpenError as e:
+        print(f"Skipped: {e}")
+        sys.exit(1)
+    except phenom.PageError as e:
+        print(e)
         sys.exit(1)
-
-    data = resp.json()
-    postings = extract_jobs(data)
-
-    if limit_n is not None:
-        postings = postings[:limit_n]
-
-    write_postings_to_file(postings, cfg.base_url, OUTPUT_PATH)
 
     # Console: print count and a confirmation
-    print(len(postings))
-    print(f'Wrote {len(postings)} posting(s) to "{OUTPUT_PATH}".')
+    print(n)
+    print(f'Wrote {n} posting(s) to "{OUTPUT_PATH}".')
+    if poll:
+        print(poll.finish())
 
 if __name__ == "__main__":
-    main()
+    from cpl import cli
+
+    sys.exit(cli.main(["cvs-health", *sys.argv[1:]]))
@@ -1,24 +1,10 @@
 #!/usr/bin/env python3
-import argparse, json, sys, re
+import argparse, json, sys
 from pathlib import Path
 
-def norm(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s)
-    s = s.strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def job_key(job: dict) -> str:
-    # Prefer job_link if present; else fall back to normalized title+location+date
-    link = (job.get("job_link") or "").strip()
-    if link:
-        return f"link::{link}"
-    title = norm(job.get("job_title"))
-    loc   = norm(job.get("job_location"))
-    date  = norm(job.get("job_posted_date"))
-    return f"tld::{title}|{loc}|{date}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared cpl package
+from cpl import fingerprint
+from cpl.keys import job_key
 
 def load_jobs(path: Path) -> list[dict]:
     data = json.loads(path.read_text(encoding="utf-8"))
@@ -33,17 +19,31 @@ def compare(a_path: Path, b_path: Path, show_examples=10):
     a_keys = [job_key(j) for j in A]
     b_keys = [job_key(j) for j in B]
 
+    # job_id is just the running index, so it is not part of a posting's content
+    a_fp = {k: fingerprint.of(j, ignore=("job_id",)) for k, j in zip(a_keys, A)}
+    b_fp = {k: fingerprint.of(j, ignore=("job_id",)) for k, j in zip(b_keys, B)}
+
     setA, setB = set(a_keys), set(b_keys)
 
     onlyA = sorted(setA - setB)
     onlyB = sorted(setB - setA)
     inter = setA & setB
+    modified = [
+        (k, fingerprint.changed_fields(a_fp[k][1], b_fp[k][1]))
+        for k in sorted(inter) if a_fp[k][0] != b_fp[k][0]
+    ]
 
     print(f"File A: {a_path}  (jobs: {len(A)})")
     print(f"File B: {b_path}  (jobs: {len(B)})")
     print(f"Intersection: {len(inter)}")
     print(f"Only in A: {len(onlyA)}")
     print(f"Only in B: {len(onlyB)}")
+    print(f"Modified: {len(modified)}")
+
+    if modified:
+        print(f"\n-- Modified (showing up to {show_examples}):")
+        for k, fields in modified[:show_examples]:
+            print(f"   {k}  [{', '.join(fields)}]")
 
     if onlyA or onlyB:
         print("\n== Differences ==")
@@ -56,6 +56,9 @@ def compare(a_path: Path, b_path: Path, show_examples=10):
             for k in onlyB[:show_examples]:
                 print("  ", k)
         return 2  # sets differ
+    elif modified:
+        print("\nSets match but some postings were edited ✏️")
+        return 4  # same postings, different content
     else:
         # Sets equal — check order
         if a_keys == b_keys:
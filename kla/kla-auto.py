@@ -1,15 +1,23 @@
+from __future__ import annotations
+
 import os
 import sys
 import json
 import typing as t
-import requests
+from itertools import count
 from dataclasses import dataclass
-from dotenv import load_dotenv
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # repo root, for the shared cpl package
+from cpl import archive, pipeline, throttle
+
+if t.TYPE_CHECKING:  # requests/dotenv are imported lazily to keep startup fast
+    import requests
 
 
 # ===== Config =====
 SEARCH_PATH = "/wday/cxs/kla/Search/jobs"
-OUTPUT_PATH = "kla-auto.txt"
+OUTPUT_PATH = str(Path(__file__).with_name("kla-auto.txt"))
 SEPARATOR = "#" * 91  # line of hashes between postings
 
 DEFAULT_PAYLOAD = {
@@ -18,6 +26,7 @@ DEFAULT_PAYLOAD = {
     "offset": 0,
     "searchText": ""
 }
+DEFAULT_PAGES = 1  # pages of DEFAULT_PAYLOAD["limit"] postings fetched per run (0 = all)
 
 DEFAULT_UA = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -33,6 +42,8 @@ class WDConfig:
     user_agent: str = DEFAULT_UA
 
 def load_config() -> WDConfig:
+    from dotenv import load_dotenv
+
     load_dotenv()
     base = os.getenv("WD_BASE_URL", "https://kla.wd1.myworkdayjobs.com").rstrip("/")
     cookie = os.getenv("WD_COOKIE", "").strip()
@@ -60,12 +71,46 @@ def build_headers(cfg: WDConfig) -> dict:
 def post_search(cfg: WDConfig, payload: dict) -> requests.Response:
     url = f"{cfg.base_url}{SEARCH_PATH}"
     headers = build_headers(cfg)
-    return requests.post(url, headers=headers, json=payload, timeout=30)
+    return throttle.post(url, headers=headers, json=payload, timeout=30)
+
+def iter_search_pages(cfg: WDConfig, pages: int,
+                      on_exhausted: t.Optional[t.Callable[[], None]] = None) -> t.Iterator[dict]:
+    """
+    Yield one search response per page (offset += limit); pages=0 means all.
+    Calls on_exhausted() when a short page or Workday's `total` shows the end was reached.
+    """
+    size = DEFAULT_PAYLOAD["limit"]
+    total = None
+    for i in (count() if pages == 0 else range(pages)):
+        payload = dict(DEFAULT_PAYLOAD, offset=i * size)
+        try:
+            resp = post_search(cfg, payload)
+        except throttle.CircuitOpenError as e:
+            print(f"Skipped: {e}")
+            sys.exit(1)
+        if resp.status_code != 200:
+            print(f"HTTP {resp.status_code}\n{resp.text[:1000]}")
+            sys.exit(1)
+        data = resp.json()
+        if isinstance(data.get("total"), int) and data["total"] > 0:
+            total = data["total"]  # only reported on the first page
+        yield data
+        if len(extract_jobs(data)) < size or (total is not None and (i + 1) * size >= total):
+            if on_exhausted:
+                on_exhausted()
+            return
 
 def extract_jobs(resp_json: dict) -> t.List[dict]:
     jp = resp_json.get("jobPostings")
     return jp if isinstance(jp, list) else []
 
+def posting_key(post: dict) -> str:
+    return post.get("externalPath") or format_posting_for_text(post)
+
+def archive_record(post: dict) -> dict:
+    # postedOn is relative ("Posted 3 Days Ago"), so it would show every posting as modified daily
+    return {f: post.get(f, "") for f in ("title", "externalPath", "locationsText")}
+
 def q(v) -> str:
     """JSON-quote a value (keeps quotes and escapes consistent)."""
     return json.dumps(v if v is not None else "", ensure_ascii=False)
@@ -83,42 +128,34 @@ def format_posting_for_text(post: dict) -> str:
         f'"postedOn": {q(posted)}'
     )
 
-def write_postings_to_file(postings: t.List[dict], out_path: str) -> None:
-    # Overwrite the file each run
-    with open(out_path, "w", encoding="utf-8") as f:
-        for idx, p in enumerate(postings):
-            f.write(format_posting_for_text(p) + "\n")
-            if idx != len(postings) - 1:
-                f.write(SEPARATOR + "\n")
+def write_postings_to_file(postings: t.Iterable[dict], out_path: str) -> int:
+    # Overwrite the file each run, one posting at a time as they stream in
+    return pipeline.drain(postings, pipeline.TextSink(out_path, format_posting_for_text, SEPARATOR))
 
-def main():
+def main(limit_n: t.Optional[int] = None, pages: t.Optional[int] = None):
     cfg = load_config()
 
-    # Two usages:
-    # 1) no args     -> write ALL jobPostings to file + print count
-    # 2) --N         -> write first N jobPostings to file + print count
-    args = sys.argv[1:]
-    limit_n = None
-    if len(args) == 1 and args[0].startswith("--") and args[0][2:].isdigit():
-        limit_n = int(args[0][2:])
-
-    payload = dict(DEFAULT_PAYLOAD)
-    resp = post_search(cfg, payload)
-    if resp.status_code != 200:
-        print(f"HTTP {resp.status_code}\n{resp.text[:1000]}")
-        sys.exit(1)
-
-    data = resp.json()
-    postings = extract_jobs(data)
-
-    if limit_n is not None:
-        postings = postings[:limit_n]
-
-    write_postings_to_file(postings, OUTPUT_PATH)
+    # Two usages (argument parsing lives in cpl/cli.py):
+    # 1) limit_n=None -> write ALL jobPostings from `pages` pages to file + print count
+    # 2) limit_n=N    -> write first N jobPostings to file + print count (stops fetching at N)
+    # Only complete sweeps go into the history archive (see cpl/archive.py)
+    poll = archive.Poll("kla", key=posting_key, record=archive_record) if limit_n is None else None
+    postings = pipeline.stream(
+        iter_search_pages(cfg, DEFAULT_PAGES if pages is None else pages,
+                          on_exhausted=poll.mark_complete if poll else None),
+        extract=extract_jobs,
+        key=posting_key,
+        limit=limit_n,
+    )
+    n = write_postings_to_file(poll.tee(postings) if poll else postings, OUTPUT_PATH)
 
     # Console confirmation + length
-    print(len(postings))
-    print(f'Wrote {len(postings)} posting(s) to "{OUTPUT_PATH}".')
+    print(n)
+    print(f'Wrote {n} posting(s) to "{OUTPUT_PATH}".')
+    if poll:
+        print(poll.finish())
 
 if __name__ == "__main__":
-    main()
+    from cpl import cli
+
+    sys.exit(cli.main(["kla", *sys.argv[1:]]))
@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cpl import archive
+
+
+def poll(root, records, when):
+    p = archive.Poll("p", key=lambda r: r["link"], root=root)
+    list(p.tee(records))
+    p.mark_complete()
+    return p.commit(when)
+
+
+def test_edits_on_rollover_polls_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "SEGMENT_RECORDS", 1)
+    poll(tmp_path, [{"link": "a", "title": "v0"}], 490)
+    for i, when in enumerate((500, 510, 520, 530, 540), start=1):
+        poll(tmp_path, [{"link": "a", "title": f"v{i}"}], when)
+
+    arc = archive.Archive("p", root=tmp_path)
+    assert [when for when, _, _ in arc.changes(0)] == [500, 510, 520, 530, 540]
+    assert [f["title"] for _, _, f in arc.changes(0)][-1] == ["v4", "v5"]
+    assert arc.at(520)["a"]["title"] == "v3"
+    assert arc.at(545)["a"]["title"] == "v5"
+
+
+def test_removed_fields_are_dropped(tmp_path):
+    poll(tmp_path, [{"link": "a", "title": "A", "loc": "NY"}], 100)
+    summary = poll(tmp_path, [{"link": "a", "title": "B"}], 200)
+
+    arc = archive.Archive("p", root=tmp_path)
+    assert summary["changes"] == {"a": ["loc", "title"]}
+    assert arc.at(200)["a"] == {"link": "a", "title": "B"}
+    assert list(arc.changes(0)) == [(200, "a", {"title": ["A", "B"], "loc": ["NY"]})]
+
+
+def test_record_projection_is_archived_items_are_yielded(tmp_path):
+    def run(items, when):
+        p = archive.Poll("p", key=lambda r: r["link"], record=lambda r: {"link": r["link"]}, root=tmp_path)
+        out = list(p.tee(items))
+        p.mark_complete()
+        p.commit(when)
+        return out
+
+    assert run([{"link": "a", "posted": "Today"}], 100) == [{"link": "a", "posted": "Today"}]
+    run([{"link": "a", "posted": "Yesterday"}], 200)
+
+    arc = archive.Archive("p", root=tmp_path)
+    assert arc.at(200) == {"a": {"link": "a"}}
+    assert list(arc.changes(0)) == []
+
+
+def test_overlapping_polls_archive_once(tmp_path):
+    first = archive.Poll("p", key=lambda r: r["link"], root=tmp_path)
+    second = archive.Poll("p", key=lambda r: r["link"], root=tmp_path)
+    for p in (first, second):
+        list(p.tee([{"link": "x"}]))
+        p.mark_complete()
+
+    assert second.finish().startswith("Not archived: another p poll")
+    first.commit(100)
+    poll(tmp_path, [{"link": "x"}], 200)
+
+    assert archive.Archive("p", root=tmp_path).spans("x") == [[100, None]]
@@ -0,0 +1,104 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cpl import phenom
+
+
+class Resp:
+    def __init__(self, status_code=200, body=None, text=None):
+        self.status_code = status_code
+        self._body = body
+        self.text = text if text is not None else json.dumps(body)
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("not JSON")
+        return self._body
+
+
+def server(n_jobs, cap=25, hits=True):
+    """Fake /widgets: honours `from`, but never serves more than `cap` jobs a call."""
+    calls = []
+
+    def post(payload):
+        calls.append(payload["from"])
+        start = payload["from"]
+        jobs = [{"jobId": i} for i in range(start, min(start + min(payload["size"], cap), n_jobs))]
+        body = {"data": {"jobs": jobs}}
+        if hits:
+            body["totalHits"] = n_jobs
+        return Resp(body=body)
+
+    return post, calls
+
+
+def sweep(post, max_jobs=None, **kw):
+    exhausted = []
+    pages = list(phenom.iter_widget_pages(post, {}, max_jobs, on_exhausted=lambda: exhausted.append(1), **kw))
+    return [j["jobId"] for p in pages for j in phenom.extract_jobs(p)], bool(exhausted)
+
+
+def test_server_capped_page_size_is_paged_through():
+    post, calls = server(200, cap=25)
+    ids, exhausted = sweep(post)
+    assert ids == list(range(200))
+    assert exhausted
+    assert sorted(calls) == list(range(0, 200, 25))
+
+
+def test_max_jobs_stops_short_of_the_end():
+    post, _ = server(200, cap=25)
+    ids, exhausted = sweep(post, max_jobs=100)
+    assert ids == list(range(100))
+    assert not exhausted
+
+
+def test_without_total_hits_an_empty_page_ends_the_sweep():
+    post, _ = server(60, cap=25, hits=False)
+    ids, exhausted = sweep(post, concurrency=2)
+    assert ids == list(range(60))
+    assert exhausted
+
+
+def test_bad_later_page_raises_page_error():
+    good, _ = server(200)
+
+    def post(payload):
+        return Resp(text="<html>login</html>") if payload["from"] == 50 else good(payload)
+
+    with pytest.raises(phenom.PageError):
+        sweep(post)
+
+
+def test_rejected_first_call_falls_back_to_html():
+    post = lambda payload: Resp(status_code=403, text="forbidden")
+    html_pages = {0: [{"jobId": 0}, {"jobId": 1}], 2: []}
+
+    def get_html(offset):
+        return '<script>var x = {"eagerLoadRefineSearch": %s};</script>' % json.dumps(
+            {"data": {"jobs": html_pages[offset]}})
+
+    exhausted = []
+    pages = phenom.with_fallback(
+        phenom.iter_widget_pages(post, {}, None),
+        lambda: phenom.iter_html_pages(get_html, None, lambda: exhausted.append(1)),
+    )
+    assert [j["jobId"] for p in pages for j in phenom.extract_jobs(p)] == [0, 1]
+    assert exhausted
+
+
+@pytest.mark.parametrize("body", [{"data": {"jobs": []}}, {"data": {"jobs": []}, "totalHits": 137}])
+def test_empty_first_page_is_rejected_unless_total_hits_is_zero(body):
+    with pytest.raises(phenom.WidgetsRejected):
+        sweep(lambda payload: Resp(body=body))
+
+
+def test_empty_first_page_with_zero_total_hits_is_the_end():
+    ids, exhausted = sweep(lambda payload: Resp(body={"data": {"jobs": []}, "totalHits": 0}))
+    assert ids == []
+    assert exhausted
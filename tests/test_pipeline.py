@@ -0,0 +1,82 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cpl import pipeline
+
+
+def pages(n_pages=None, per_page=10, fail_at=None):
+    """Numbered pages of `per_page` items; records how many were fetched and whether it was closed."""
+    state = {"fetched": 0, "closed": threading.Event()}
+
+    def gen():
+        try:
+            i = 0
+            while n_pages is None or i < n_pages:
+                if i == fail_at:
+                    raise ValueError(f"page {i} failed")
+                state["fetched"] += 1
+                yield list(range(i * per_page, (i + 1) * per_page))
+                i += 1
+        finally:
+            state["closed"].set()
+
+    return gen(), state
+
+
+def test_limit_stops_the_prefetch_worker():
+    src, state = pages()  # endless
+    items = pipeline.stream(src, extract=lambda p: p, limit=5, depth=2)  # still referenced, as in main()
+    assert list(items) == [0, 1, 2, 3, 4]
+    assert state["closed"].wait(2)
+    assert state["fetched"] <= 2 + 2  # the page used, `depth` queued, one being fetched
+
+
+def test_drain_closes_the_stream_when_the_sink_fails(tmp_path):
+    src, state = pages()
+
+    class Broken(pipeline.TextSink):
+        def write_item(self, item):
+            if item == 3:
+                raise OSError("disk full")
+            super().write_item(item)
+
+    items = pipeline.stream(src, extract=lambda p: p)
+    with pytest.raises(OSError):
+        pipeline.drain(items, Broken(tmp_path / "out.txt", str, "--"))
+    assert state["closed"].wait(2)
+
+
+def test_errors_in_the_fetch_thread_reach_the_consumer():
+    src, _ = pages(fail_at=1)
+    items = pipeline.stream(src, extract=lambda p: p)
+    with pytest.raises(ValueError, match="page 1 failed"):
+        list(items)
+
+
+def test_sink_replaces_output_only_on_success(tmp_path):
+    out = tmp_path / "out.txt"
+    out.write_text("previous\n", encoding="utf-8")
+
+    src, _ = pages(fail_at=1)
+    with pytest.raises(ValueError):
+        pipeline.drain(pipeline.stream(src, extract=lambda p: p), pipeline.TextSink(out, str, "--"))
+    assert out.read_text(encoding="utf-8") == "previous\n"
+    assert not (tmp_path / "out.txt.tmp").exists()
+
+    src, _ = pages(n_pages=1, per_page=2)
+    assert pipeline.drain(pipeline.stream(src, extract=lambda p: p), pipeline.TextSink(out, str, "--")) == 2
+    assert out.read_text(encoding="utf-8") == "0\n--\n1\n"
+    assert not (tmp_path / "out.txt.tmp").exists()
+
+
+@pytest.mark.parametrize("items", [[], [{"a": 1}, {"b": ["x", "é"]}]])
+def test_json_array_sink_matches_json_dump(tmp_path, items):
+    out = tmp_path / "out.json"
+    pipeline.drain(iter(items), pipeline.JsonArraySink(out))
+    assert out.read_text(encoding="utf-8") == json.dumps(items, ensure_ascii=False, indent=2)
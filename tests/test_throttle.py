@@ -0,0 +1,122 @@
+import sys
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cpl import throttle
+
+FAST = dict(start_rate=1000.0, min_rate=1000.0, max_rate=1000.0, burst=1000.0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(throttle.time, "monotonic", c)
+    return c
+
+
+class Session:
+    """Answers with the queued statuses in order; an exception class is raised instead."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        r = self.results.pop(0)
+        if isinstance(r, type):
+            raise r("boom")
+        resp = requests.Response()
+        resp.status_code = r
+        return resp
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through(clock):
+    b = throttle.CircuitBreaker("h", throttle.HostPolicy(fail_threshold=2, cooldown=10))
+    b.record_failure()
+    b.before_request()
+    b.record_failure()
+    with pytest.raises(throttle.CircuitOpenError):
+        b.before_request()
+
+    clock.now = 10
+    b.before_request()  # half-open probe
+    with pytest.raises(throttle.CircuitOpenError):
+        b.before_request()  # only one probe at a time
+    b.record_failure()  # failed probe re-opens for a full cooldown
+    clock.now = 15
+    with pytest.raises(throttle.CircuitOpenError):
+        b.before_request()
+
+    clock.now = 20
+    b.before_request()
+    b.record_success()
+    b.before_request()
+    b.before_request()
+
+
+def test_released_probe_lets_the_next_request_probe(clock):
+    b = throttle.CircuitBreaker("h", throttle.HostPolicy(fail_threshold=1, cooldown=5))
+    b.record_failure()
+    clock.now = 5
+    b.before_request()
+    b.release()
+    b.before_request()
+
+
+def test_aimd_rate(clock):
+    bucket = throttle.TokenBucket(throttle.HostPolicy(start_rate=2, min_rate=0.5, max_rate=4, slow_after=5))
+    bucket.on_success(0.1)
+    assert bucket.rate == 3
+    bucket.on_success(0.1)
+    bucket.on_success(0.1)
+    assert bucket.rate == 4
+    bucket.on_success(6)  # slow response
+    assert bucket.rate == 2
+    bucket.on_throttled(30)
+    assert bucket.rate == 1
+    assert bucket.tokens == 0
+    assert bucket.paused_until == 30
+    for _ in range(5):
+        bucket.on_throttled(None)
+    assert bucket.rate == 0.5
+
+
+def test_parse_retry_after():
+    assert throttle.parse_retry_after("120") == 120
+    assert throttle.parse_retry_after(None) is None
+    assert throttle.parse_retry_after("soon") is None
+    assert throttle.parse_retry_after(formatdate(0, usegmt=True)) == 0
+    in_a_minute = throttle.parse_retry_after(formatdate(throttle.time.time() + 60, usegmt=True))
+    assert 55 < in_a_minute <= 60
+
+
+def test_5xx_never_speeds_a_host_up():
+    throttle.set_policy("five.example", throttle.HostPolicy(start_rate=200, min_rate=50, fail_threshold=10))
+    for _ in range(3):
+        assert throttle.get("https://five.example/", session=Session(500)).status_code == 500
+    assert throttle.bucket_for("five.example").rate == 50
+
+
+def test_timeouts_are_retried_and_trip_the_breaker():
+    throttle.set_policy("slow.example", throttle.HostPolicy(**FAST, fail_threshold=3, max_retries=2))
+    sess = Session(requests.Timeout, requests.Timeout, 200)
+    assert throttle.get("https://slow.example/", session=sess).status_code == 200
+
+    sess = Session(requests.Timeout, requests.Timeout, requests.Timeout)
+    with pytest.raises(throttle.CircuitOpenError):
+        throttle.get("https://slow.example/", session=sess)
+    assert sess.calls == 3